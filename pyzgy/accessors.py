@@ -58,51 +58,57 @@ class SliceAccessor(Accessor):
 
 
 class InlineAccessor(SliceAccessor, Mapping):
-    def __init__(self, file):
-        super(Accessor, self).__init__(file)
+    def __init__(self, file, prefetch=True):
+        super(Accessor, self).__init__(file, prefetch)
         self.len_object = self.n_ilines
         self.keys_object = self.ilines
         self.values_function = self.read_inline_number
 
 class CrosslineAccessor(SliceAccessor, Mapping):
-    def __init__(self, file):
-        super(Accessor, self).__init__(file)
+    def __init__(self, file, prefetch=True):
+        super(Accessor, self).__init__(file, prefetch)
         self.len_object = self.n_xlines
         self.keys_object = self.xlines
         self.values_function = self.read_crossline_number
 
 class ZsliceAccessor(Accessor, Mapping):
-    def __init__(self, file):
-        super(Accessor, self).__init__(file)
+    def __init__(self, file, prefetch=True):
+        super(Accessor, self).__init__(file, prefetch)
         self.len_object = self.n_samples
         self.keys_object = self.samples
         self.values_function = self.read_zslice
 
 class HeaderAccessor(Accessor, Mapping):
-    def __init__(self, file):
-        super(Accessor, self).__init__(file)
+    def __init__(self, file, prefetch=True):
+        super(Accessor, self).__init__(file, prefetch)
         self.len_object = self.tracecount
         self.keys_object = range(self.tracecount)
         self.values_function = self.gen_trace_header
 
 class TraceAccessor(Accessor, Mapping):
-    def __init__(self, file):
-        super(Accessor, self).__init__(file)
+    def __init__(self, file, prefetch=True):
+        super(Accessor, self).__init__(file, prefetch)
         self.len_object = self.tracecount
         self.keys_object = range(self.tracecount)
         self.values_function = self.get_trace
 
 
 class SegyioEmulator(SeismicReader):
-    def __init__(self, filename):
-        super(SegyioEmulator, self).__init__(filename)
-        self.iline = InlineAccessor(self.filehandle)
-        self.xline = CrosslineAccessor(self.filehandle)
-        self.depth_slice = ZsliceAccessor(self.filehandle)
-        self.trace = TraceAccessor(self.filehandle)
-        self.header = HeaderAccessor(self.filehandle)
+    def __init__(self, filename, prefetch=True):
+        super(SegyioEmulator, self).__init__(filename, prefetch)
+        self.iline = InlineAccessor(self.filehandle, prefetch)
+        self.xline = CrosslineAccessor(self.filehandle, prefetch)
+        self.depth_slice = ZsliceAccessor(self.filehandle, prefetch)
+        self.trace = TraceAccessor(self.filehandle, prefetch)
+        self.header = HeaderAccessor(self.filehandle, prefetch)
         self.unstructured = False
 
+    def close(self):
+        # The accessors are separate readers sharing this filehandle, each with its own chunks and prefetch
+        for accessor in (self.iline, self.xline, self.depth_slice, self.trace, self.header):
+            accessor._release_chunks()
+        super(SegyioEmulator, self).close()
+
 # Copyright 2021, Equinor
 #
 # Licensed under the Apache License, Version 2.0 (the "License");
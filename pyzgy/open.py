@@ -1,8 +1,8 @@
 from .accessors import SegyioEmulator
 
-def open(filename, mode='r'):
+def open(filename, mode='r', prefetch=True):
     assert (mode == 'r')
-    return SegyioEmulator(filename)
+    return SegyioEmulator(filename, prefetch)
 
 # Copyright 2021, Equinor
 #
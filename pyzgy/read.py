@@ -1,4 +1,7 @@
+import os
 import struct
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
 
 import numpy as np
 import segyio
@@ -7,9 +10,39 @@ from segyio import _segyio
 from openzgy.api import ZgyReader
 from .loader import ZgyLoader
 
+_S_I = struct.Struct(">i")
+_S_H = struct.Struct(">H")
+_S_h = struct.Struct(">h")
+
+
+def _store_be_i4(headers, offset, values):
+    # Column slices of headers are not contiguous, so write bytes from a contiguous big-endian copy
+    headers[:, offset:offset + 4] = np.asarray(values).astype(">i4").reshape(-1, 1).view(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _emit_cdp_kernel():
+    # numba is optional and slow to import, so it is only loaded on the first bulk header request
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+
+    @njit(parallel=True, cache=True)
+    def _emit_cdp_be(il, xl, c00, c01, dxi, dyi, dxx, dyx, headers):
+        # Writes CDP X/Y in cm as big-endian int32 straight into bytes 181-188 of each header row
+        for t in prange(il.size):
+            x = round(100.0 * (c00 + il[t] * dxi + xl[t] * dxx))
+            y = round(100.0 * (c01 + il[t] * dyi + xl[t] * dyx))
+            for b in range(4):
+                headers[t, 180 + b] = (x >> (24 - 8 * b)) & 0xff
+                headers[t, 184 + b] = (y >> (24 - 8 * b)) & 0xff
+
+    return _emit_cdp_be
+
 
 class SeismicReader:
-    def __init__(self, filename):
+    def __init__(self, filename, prefetch=True):
         if isinstance(filename, ZgyReader):
             self._filename = filename._fd._name
             self.filehandle = filename
@@ -18,25 +51,46 @@ class SeismicReader:
             self.filehandle = ZgyReader(self._filename)
         self.loader = ZgyLoader(self.filehandle)
 
+        # Most recently decompressed 64-wide chunk along each axis, stored
+        # as (base_index, chunk) so sequential reads reuse the same block.
+        self._chunk_cache = {axis: (None, None) for axis in ("il", "xl", "z", "tr")}
+        self._chunk_loaders = {"il": self.loader.load_inline_chunk,
+                               "xl": self.loader.load_crossline_chunk,
+                               "z": self.loader.load_zslice_chunk,
+                               "tr": lambda base: self.loader.load_trace_chunk(*base)}
+        # Chunk being decompressed in the background during sequential sweeps, as (base_index, future)
+        self._prefetch_enabled = prefetch
+        self._prefetched = {}
+        self._prefetch_pool = None
+
         self.n_ilines, self.n_xlines, self.n_samples = self.filehandle.size
         self.tracecount = self.n_xlines * self.n_ilines
 
-        self.ilines = self.get_haxis(0)
-        self.xlines = self.get_haxis(1)
-
-        self.samples = np.arange(self.filehandle.zstart,
-                                 self.filehandle.zstart+self.n_samples*self.filehandle.zinc,
-                                 self.filehandle.zinc)
-
         self.corners = self.filehandle.corners
         self.annotstart = self.filehandle.annotstart
         self.annotinc = self.filehandle.annotinc
         self.zinc = self.filehandle.zinc
 
-        self.easting_inc_il = (self.corners[1][0] - self.corners[0][0]) / (self.filehandle.size[0] - 1)
-        self.northing_inc_il = (self.corners[1][1] - self.corners[0][1]) / (self.filehandle.size[0] - 1)
-        self.easting_inc_xl = (self.corners[2][0] - self.corners[0][0]) / (self.filehandle.size[1] - 1)
-        self.northing_inc_xl = (self.corners[2][1] - self.corners[0][1]) / (self.filehandle.size[1] - 1)
+        # (start, increment, count) of each axis, for index lookups without building the axis
+        self._axis_meta = {"il": (int(self.annotstart[0]), int(self.annotinc[0]), self.n_ilines),
+                           "xl": (int(self.annotstart[1]), int(self.annotinc[1]), self.n_xlines),
+                           "z": (self.filehandle.zstart, self.zinc, self.n_samples)}
+
+        # Trace header fields which are the same for every trace
+        header = bytearray(240)
+        _S_h.pack_into(header, 70, -100)  # A scalar of -100 is implicit in supplying UTM coordinates in cm
+        _S_H.pack_into(header, 114, self.n_samples)  # Samples per trace
+        _S_H.pack_into(header, 116, int(self.zinc * 1000))  # Sample interval (μs/m)
+        self._header_template = bytes(header)
+
+        # Affine map from (iline, xline) index to (x, y): origin + affine @ (il, xl)
+        # A survey with a single inline or crossline has no spacing along that axis, so use a zero increment
+        self._cdp_origin = np.array(self.corners[0], dtype=np.float64)
+        self._cdp_affine = np.column_stack([
+            (np.array(self.corners[1]) - self._cdp_origin) / (self.n_ilines - 1) if self.n_ilines > 1 else np.zeros(2),
+            (np.array(self.corners[2]) - self._cdp_origin) / (self.n_xlines - 1) if self.n_xlines > 1 else np.zeros(2)])
+        ((self.easting_inc_il, self.easting_inc_xl),
+         (self.northing_inc_il, self.northing_inc_xl)) = self._cdp_affine.tolist()
 
     def __enter__(self):
         return self
@@ -45,22 +99,108 @@ class SeismicReader:
         self.close()
 
     def close(self):
+        self._release_chunks()
         self.filehandle.close()
 
+    def _release_chunks(self):
+        self._stop_prefetch()
+        self._chunk_cache = {axis: (None, None) for axis in self._chunk_cache}
+
+    def _stop_prefetch(self):
+        # Must run before the filehandle is closed, so no background read outlives the file
+        if self._prefetch_pool is not None:
+            self._prefetch_pool.shutdown(wait=True, cancel_futures=True)
+            self._prefetch_pool = None
+        self._prefetched.clear()
+
     @staticmethod
     def coord_to_index(coord, coords, include_stop=False):
-        try:
-            index = np.where(coords == coord)[0][0]
-        except:
-            if include_stop and (coord == coords[-1] + (coords[-1] - coords[-2])):
-                return len(coords)
+        matches = np.flatnonzero(coords == coord)
+        if matches.size:
+            return int(matches[0])
+        if include_stop and len(coords) > 1 and coord == coords[-1] + (coords[-1] - coords[-2]):
+            return len(coords)
+        raise IndexError("Coordinate {} not in axis".format(coord))
+
+    @staticmethod
+    def _arith_index(coord, start, inc, n, include_stop=False):
+        index = int(round((coord - start) / inc))
+        if coord != start + index * inc or not 0 <= index < n + include_stop:
             raise IndexError("Coordinate {} not in axis".format(coord))
         return index
 
+    @cached_property
+    def ilines(self):
+        return self.get_haxis(0)
+
+    @cached_property
+    def xlines(self):
+        return self.get_haxis(1)
+
+    @cached_property
+    def samples(self):
+        return self.filehandle.zstart + np.arange(self.n_samples, dtype=np.float64) * self.filehandle.zinc
+
+    def sample_at(self, z_idx):
+        """Returns the time/depth of one sample without building the samples array
+
+        Parameters
+        ----------
+        z_idx : int
+            The ordinal number of the sample in the trace, negative values count from the end
+
+        Returns
+        -------
+        sample : float
+            The sample time or depth, equal to samples[z_idx]
+        """
+        if not -self.n_samples <= z_idx < self.n_samples:
+            raise IndexError("Index {} is out of range, total samples is {}".format(z_idx, self.n_samples))
+        if z_idx < 0:
+            z_idx += self.n_samples
+        return self.filehandle.zstart + z_idx * self.filehandle.zinc
+
+    def _load_chunk(self, axis, base):
+        cached_base, chunk = self._chunk_cache[axis]
+        if cached_base == base:
+            return chunk
+        prefetched_base, future = self._prefetched.pop(axis, (None, None))
+        if prefetched_base == base:
+            chunk = future.result()
+        else:
+            if future is not None:
+                future.cancel()
+            chunk = self._chunk_loaders[axis](base)
+        self._chunk_cache[axis] = (base, chunk)
+        if axis != "tr" and cached_base == base - 64:
+            self._prefetch(axis, base + 64)
+        return chunk
+
+    def _prefetch(self, axis, base):
+        fd = self.filehandle._fd
+        if not self._prefetch_enabled or base >= self._axis_meta[axis][2] or fd is None or not fd.threadsafe:
+            return
+        if self._prefetch_pool is None:
+            self._prefetch_pool = ThreadPoolExecutor(max_workers=1)
+        self._prefetched[axis] = (base, self._prefetch_pool.submit(self._chunk_loaders[axis], base))
+
+    @staticmethod
+    def _slab(view, copy):
+        if copy:
+            return view.copy()
+        view.flags.writeable = False
+        return view
+
+    def _volume_tiles(self, buf):
+        bi, bx, bz = self.filehandle.bricksize
+        for i0 in range(0, self.n_ilines, bi):
+            for x0 in range(0, self.n_xlines, bx):
+                for z0 in range(0, self.n_samples, bz):
+                    yield (i0, x0, z0), buf[i0:i0 + bi, x0:x0 + bx, z0:z0 + bz]
+
     def get_haxis(self, idx):
-        return np.arange(int(self.filehandle.annotstart[idx]),
-                         int(self.filehandle.annotstart[idx] + self.filehandle.size[idx]*self.filehandle.annotinc[idx]),
-                         int(self.filehandle.annotinc[idx]), dtype=np.intc)
+        start, inc = np.int32(self.filehandle.annotstart[idx]), np.int32(self.filehandle.annotinc[idx])
+        return start + np.arange(self.filehandle.size[idx], dtype=np.int32) * inc
 
     def read_inline_number(self, il_no):
         """Reads one inline from ZGY file
@@ -75,22 +215,30 @@ class SeismicReader:
         inline : numpy.ndarray of float32, shape: (n_xlines, n_samples)
             The specified inline, decompressed
         """
-        return self.read_inline(self.coord_to_index(il_no, self.ilines))
+        return self.read_inline(self._arith_index(il_no, *self._axis_meta["il"]))
 
-    def read_inline(self, il_idx):
+    def read_inline(self, il_idx, copy=True):
         """Reads one inline from ZGY file
 
+        Inlines are decompressed 64 at a time and the last chunk is kept for the next call.
+        During a sequential sweep the following chunk is also decompressed in the background,
+        holding up to 2 * 64 * n_xlines * n_samples float32 values; pass prefetch=False to the
+        reader to avoid this
+
         Parameters
         ----------
         il_idx : int
             The ordinal number of the inline in the file
+        copy : bool, optional
+            If False, return a read-only view into the reader's cached chunk instead of a copy.
+            This avoids copying the data, but the view keeps the whole 64-wide chunk alive
 
         Returns
         -------
         inline : numpy.ndarray of float32, shape: (n_xlines, n_samples)
             The specified inline, decompressed
         """
-        return self.loader.load_inline_chunk(64*(il_idx//64))[il_idx % 64, :, :].copy()
+        return self._slab(self._load_chunk("il", 64 * (il_idx // 64))[il_idx % 64, :, :], copy)
 
     def read_crossline_number(self, xl_no):
         """Reads one crossline from ZGY file
@@ -105,22 +253,30 @@ class SeismicReader:
         crossline : numpy.ndarray of float32, shape: (n_ilines, n_samples)
             The specified crossline, decompressed
         """
-        return self.read_crossline(self.coord_to_index(xl_no, self.xlines))
+        return self.read_crossline(self._arith_index(xl_no, *self._axis_meta["xl"]))
 
-    def read_crossline(self, xl_idx):
+    def read_crossline(self, xl_idx, copy=True):
         """Reads one crossline from ZGY file
 
+        Crosslines are decompressed 64 at a time and the last chunk is kept for the next call.
+        During a sequential sweep the following chunk is also decompressed in the background,
+        holding up to 2 * n_ilines * 64 * n_samples float32 values; pass prefetch=False to the
+        reader to avoid this
+
         Parameters
         ----------
         xl_idx : int
             The ordinal number of the crossline in the file
+        copy : bool, optional
+            If False, return a read-only view into the reader's cached chunk instead of a copy.
+            This avoids copying the data, but the view keeps the whole 64-wide chunk alive
 
         Returns
         -------
         crossline : numpy.ndarray of float32, shape: (n_ilines, n_samples)
             The specified crossline, decompressed
         """
-        return self.loader.load_crossline_chunk(64 * (xl_idx // 64))[:, xl_idx % 64, :].copy()
+        return self._slab(self._load_chunk("xl", 64 * (xl_idx // 64))[:, xl_idx % 64, :], copy)
 
     def read_zslice_coord(self, samp_no):
         """Reads one zslice from ZGY file (time or depth, depending on file contents)
@@ -135,22 +291,30 @@ class SeismicReader:
         zslice : numpy.ndarray of float32, shape: (n_ilines, n_xlines)
             The specified zslice (time or depth, depending on file contents), decompressed
         """
-        return self.read_zslice(self.coord_to_index(samp_no, self.samples))
+        return self.read_zslice(self._arith_index(samp_no, *self._axis_meta["z"]))
 
-    def read_zslice(self, z_idx):
+    def read_zslice(self, z_idx, copy=True):
         """Reads one zslice from ZGY file (time or depth, depending on file contents)
 
+        Zslices are decompressed 64 at a time and the last chunk is kept for the next call.
+        During a sequential sweep the following chunk is also decompressed in the background,
+        holding up to 2 * n_ilines * n_xlines * 64 float32 values; pass prefetch=False to the
+        reader to avoid this
+
         Parameters
         ----------
         z_idx : int
             The ordinal number of the zslice in the file
+        copy : bool, optional
+            If False, return a read-only view into the reader's cached chunk instead of a copy.
+            This avoids copying the data, but the view keeps the whole 64-wide chunk alive
 
         Returns
         -------
         zslice : numpy.ndarray of float32, shape: (n_ilines, n_xlines)
             The specified zslice (time or depth, depending on file contents), decompressed
         """
-        return self.loader.load_zslice_chunk(64 * (z_idx // 64))[:, :, z_idx % 64].copy()
+        return self._slab(self._load_chunk("z", 64 * (z_idx // 64))[:, :, z_idx % 64], copy)
 
     def read_subvolume(self, min_il, max_il, min_xl, max_xl, min_z, max_z):
         """Reads a sub-volume from ZGY file
@@ -177,7 +341,7 @@ class SeismicReader:
         subvolume : numpy.ndarray of float32, shape (max_il - min_il, max_xl - min_xl, max_z - min_z)
             The specified subvolume, decompressed
         """
-        buf = np.zeros((max_il-min_il, max_xl-min_xl, max_z-min_z), dtype=np.float32)
+        buf = np.empty((max_il-min_il, max_xl-min_xl, max_z-min_z), dtype=np.float32)
         self.filehandle.read((min_il, min_xl, min_z), buf)
         return buf
 
@@ -189,9 +353,13 @@ class SeismicReader:
         volume : numpy.ndarray of float32, shape (n_ilines, n_xline, n_samples)
             The whole volume, decompressed
         """
-        return self.read_subvolume(0, self.n_ilines,
-                                   0, self.n_xlines,
-                                   0, self.n_samples)
+        buf = np.empty((self.n_ilines, self.n_xlines, self.n_samples), dtype=np.float32)
+        # Bricks are independent, so they may be read concurrently if the file backend allows it
+        fd = self.filehandle._fd
+        workers = os.cpu_count() if fd is not None and fd.threadsafe else 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda tile: self.filehandle.read(*tile), self._volume_tiles(buf)))
+        return buf
 
     def get_trace(self, index):
         """Reads one trace from ZGY file
@@ -206,12 +374,40 @@ class SeismicReader:
         trace : numpy.ndarray of float32, shape (n_samples)
             A single trace, decompressed
         """
-        if not 0 <= index < self.n_ilines * self.n_xlines:
-            raise IndexError("Index {} is out of range, total traces is {}".format(index,
-                                                                                   self.n_ilines * self.n_xlines))
+        if not 0 <= index < self.tracecount:
+            raise IndexError("Index {} is out of range, total traces is {}".format(index, self.tracecount))
 
         il, xl = index // self.n_xlines, index % self.n_xlines
-        return self.loader.load_trace_chunk(64*(il//64), 64*(xl//64))[il % 64, xl % 64, :].copy()
+        return self._load_chunk("tr", (64 * (il // 64), 64 * (xl // 64)))[il % 64, xl % 64, :].copy()
+
+    def read_traces(self, indices):
+        """Reads many traces from ZGY file, decompressing each brick column only once
+
+        Parameters
+        ----------
+        indices : array_like of int
+            The ordinal numbers of the traces in the file, in any order
+
+        Returns
+        -------
+        traces : numpy.ndarray of float32, shape (len(indices), n_samples)
+            The requested traces in the given order, decompressed
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if np.any((indices < 0) | (indices >= self.tracecount)):
+            raise IndexError("Index out of range, total traces is {}".format(self.tracecount))
+
+        traces = np.empty((indices.size, self.n_samples), dtype=np.float32)
+        if not indices.size:
+            return traces
+
+        il, xl = indices // self.n_xlines, indices % self.n_xlines
+        brick = (il // 64) * ((self.n_xlines + 63) // 64) + xl // 64
+        order = np.argsort(brick, kind="stable")
+        for run in np.split(order, np.flatnonzero(np.diff(brick[order])) + 1):
+            base = (64 * int(il[run[0]] // 64), 64 * int(xl[run[0]] // 64))
+            traces[run] = self._load_chunk("tr", base)[il[run] % 64, xl[run] % 64, :]
+        return traces
 
     def gen_cdp_x(self, il_coord, xl_coord):
         """Generates the CDP X coordinate from an iline and xline pair.
@@ -255,6 +451,35 @@ class SeismicReader:
             + xl_coord * self.northing_inc_xl
         )
 
+    def gen_cdp_xy_bulk(self, il_coord, xl_coord):
+        """Generates CDP X and Y coordinates for many iline and xline pairs at once.
+
+        Parameters
+        ----------
+        il_coord : array_like of int
+           The iline indices of the cube.
+        xl_coord : array_like of int
+           The xline indices of the cube, same shape as il_coord.
+
+        Returns
+        -------
+        cdp_xy : numpy.ndarray of float64, shape (*il_coord.shape, 2)
+            The corresponding cartesian x and y coordinates
+        """
+        ij = np.stack([il_coord, xl_coord], axis=-1).astype(np.float64)
+        return self._cdp_origin + ij @ self._cdp_affine.T
+
+    def _emit_cdp(self, headers, il_coord, xl_coord):
+        emit_cdp_be = _emit_cdp_kernel()
+        if emit_cdp_be is None:
+            cdp_xy = np.rint(100.0 * self.gen_cdp_xy_bulk(il_coord, xl_coord))
+            _store_be_i4(headers, 180, cdp_xy[:, 0])
+            _store_be_i4(headers, 184, cdp_xy[:, 1])
+            return
+        emit_cdp_be(il_coord, xl_coord, self.corners[0][0], self.corners[0][1],
+                    self.easting_inc_il, self.northing_inc_il, self.easting_inc_xl, self.northing_inc_xl,
+                    headers)
+
     def gen_trace_header(self, index):
         """Generates one trace header from ZGY file,
         note that only a few SEG-Y header values can be
@@ -270,10 +495,34 @@ class SeismicReader:
         header : dict
             A single header as a dictionary of headerword-value pairs
         """
-        if not 0 <= index < self.n_ilines * self.n_xlines:
-            raise IndexError(self.range_error.format(index, 0, self.tracecount))
+        return segyio.segy.Field(self._pack_header(index), kind='trace')
+
+    def gen_trace_header_bytes(self, index):
+        """Generates one raw trace header from ZGY file,
+        with the same header values as gen_trace_header but without wrapping them in a segyio Field
+
+        Parameters
+        ----------
+        index : int
+            The ordinal number of the trace header in the file
+
+        Returns
+        -------
+        header : bytes
+            The 240 byte big-endian SEG-Y trace header
+        """
+        return bytes(self._pack_header(index))
+
+    def _pack_header(self, index):
+        if not 0 <= index < self.tracecount:
+            raise IndexError("Index {} is out of range, total traces is {}".format(index, self.tracecount))
+
+        header = bytearray(self._header_template)
+        self._pack_header_into(header, index)
+        return header
 
-        xl_coord, il_coord = index % self.n_xlines, index // self.n_xlines
+    def _pack_header_into(self, header, index):
+        il_coord, xl_coord = divmod(index, self.n_xlines)
 
         cdp_x = int(round(100.0 * self.gen_cdp_x(il_coord, xl_coord)))
         cdp_y = int(round(100.0 * self.gen_cdp_y(il_coord, xl_coord)))
@@ -281,16 +530,48 @@ class SeismicReader:
         inline_3d = int(self.annotstart[0] + il_coord * self.annotinc[0])
         crossline_3d = int(self.annotstart[1] + xl_coord * self.annotinc[1])
 
-        header = bytearray(240)
-        header[70:72] = struct.pack(">h", -100)  # A scalar of -100 is implicit in supplying UTM coordinates in cm
-        header[180:184] = struct.pack(">i", cdp_x)
-        header[184:188] = struct.pack(">i", cdp_y)
-        header[188:192] = struct.pack(">i", inline_3d)
-        header[192:196] = struct.pack(">i", crossline_3d)
-        header[114:116] = struct.pack(">H", self.n_samples)  # Samples per trace
-        header[116:118] = struct.pack(">H", int(self.zinc * 1000))  # Sample interval (μs/m)
-
-        return segyio.segy.Field(header, kind='trace')
+        _S_I.pack_into(header, 180, cdp_x)
+        _S_I.pack_into(header, 184, cdp_y)
+        _S_I.pack_into(header, 188, inline_3d)
+        _S_I.pack_into(header, 192, crossline_3d)
+
+    def gen_trace_headers(self, indices, out=None):
+        """Generates many trace headers from ZGY file in one go,
+        see gen_trace_header for the SEG-Y header values which are filled in
+
+        Parameters
+        ----------
+        indices : array_like of int
+            The ordinal numbers of the trace headers in the file
+        out : numpy.ndarray of uint8, shape (len(indices), 240), optional
+            A buffer to write the headers into, e.g. reused across batches when exporting a whole file
+
+        Returns
+        -------
+        headers : numpy.ndarray of uint8, shape (len(indices), 240)
+            The raw big-endian SEG-Y trace headers, one row per trace
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if np.any((indices < 0) | (indices >= self.tracecount)):
+            raise IndexError("Index out of range, total traces is {}".format(self.tracecount))
+
+        xl_coord, il_coord = indices % self.n_xlines, indices // self.n_xlines
+
+        inline_3d = self.annotstart[0] + il_coord * self.annotinc[0]
+        crossline_3d = self.annotstart[1] + xl_coord * self.annotinc[1]
+
+        if out is None:
+            headers = np.empty((indices.size, 240), dtype=np.uint8)
+        elif out.shape != (indices.size, 240) or out.dtype != np.uint8:
+            raise ValueError("Expected out to be a uint8 array of shape {}".format((indices.size, 240)))
+        else:
+            headers = out
+        headers[:] = np.frombuffer(self._header_template, dtype=np.uint8)
+        self._emit_cdp(headers, il_coord, xl_coord)
+        _store_be_i4(headers, 188, inline_3d)
+        _store_be_i4(headers, 192, crossline_3d)
+
+        return headers
 
 
 # Copyright 2021, Equinor
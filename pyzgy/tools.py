@@ -5,7 +5,7 @@ def cube(filename):
         return reader.read_volume()
 
 def dt(reader):
-    return 1000 * (reader.samples[1] - reader.samples[0])
+    return 1000 * (reader.sample_at(1) - reader.sample_at(0))
 
 
 # Copyright 2021, Equinor
@@ -147,16 +147,10 @@ class PyzgyBackendEntrypoint(BackendEntrypoint):
             ds.attrs[AttrKeyField.ns] = reader.n_samples
             ds.attrs[AttrKeyField.coord_scalar] = reader.filehandle.hunitfactor
 
-            indices = np.indices(reader.filehandle.size[:2])
+            cdp_xy = reader.gen_cdp_xy_bulk(*np.indices(reader.filehandle.size[:2]))
 
-            ds[CoordKeyField.cdp_x] = (
-                ("iline", "xline"),
-                xr.apply_ufunc(reader.gen_cdp_x, *indices),
-            )
-            ds[CoordKeyField.cdp_y] = (
-                ("iline", "xline"),
-                xr.apply_ufunc(reader.gen_cdp_y, *indices),
-            )
+            ds[CoordKeyField.cdp_x] = (("iline", "xline"), cdp_xy[..., 0])
+            ds[CoordKeyField.cdp_y] = (("iline", "xline"), cdp_xy[..., 1])
 
         return zgy_shape, ds
 
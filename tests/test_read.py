@@ -1,8 +1,12 @@
+import threading
+
 import numpy as np
 import pytest
 import segyio
 
+import pyzgy
 from pyzgy.read import SeismicReader
+from pyzgy.write import SeismicWriter
 from openzgy.exception import ZgyUserError
 
 
@@ -173,3 +177,210 @@ def compare_trace_header(zgy_filename, sgy_filename):
 def test_read_trace_header(zgy_sgy_file_pairs):
     ZGY_FILE, SGY_FILE = zgy_sgy_file_pairs
     compare_trace_header(ZGY_FILE, SGY_FILE)
+
+
+def test_trace_index_out_of_range(zgy_sgy_file_pairs):
+    ZGY_FILE, _ = zgy_sgy_file_pairs
+    with SeismicReader(ZGY_FILE) as reader:
+        for index in (-1, reader.tracecount):
+            for read in (reader.gen_trace_header, reader.gen_trace_header_bytes, reader.get_trace):
+                with pytest.raises(IndexError, match="out of range"):
+                    read(index)
+
+
+def test_chunk_cache_sequential_reads(zgy_sgy_file_pairs):
+    ZGY_FILE, _ = zgy_sgy_file_pairs
+    with SeismicReader(ZGY_FILE) as reader:
+        calls = []
+        load_inline_chunk = reader._chunk_loaders["il"]
+        reader._chunk_loaders["il"] = lambda base: calls.append(base) or load_inline_chunk(base)
+        lines = [reader.read_inline(il) for il in range(reader.n_ilines)]
+        assert calls == [0]
+        assert np.allclose(lines[0], reader.read_subvolume(0, 1, 0, reader.n_xlines, 0, reader.n_samples)[0])
+    assert all(chunk is None for _, chunk in reader._chunk_cache.values())
+
+
+def test_coord_lookup_matches_axes(zgy_sgy_file_pairs):
+    ZGY_FILE, _ = zgy_sgy_file_pairs
+    with SeismicReader(ZGY_FILE) as reader:
+        for axis, coords in (("il", reader.ilines), ("xl", reader.xlines), ("z", reader.samples)):
+            for index, coord in enumerate(coords):
+                assert reader._arith_index(coord, *reader._axis_meta[axis]) == index
+                assert reader.coord_to_index(coord, coords) == index
+            with pytest.raises(IndexError):
+                reader._arith_index(coords[-1] + (coords[-1] - coords[-2]), *reader._axis_meta[axis])
+            with pytest.raises(IndexError):
+                reader.coord_to_index(coords[-1] + (coords[-1] - coords[-2]), coords)
+            assert reader.coord_to_index(coords[-1] + (coords[-1] - coords[-2]), coords, include_stop=True) == len(coords)
+        with pytest.raises(IndexError):
+            reader.read_zslice_coord(reader.samples[1] / 2)
+        assert [reader.sample_at(i) for i in range(-reader.n_samples, reader.n_samples)] == 2 * list(reader.samples)
+        for i in (reader.n_samples, -reader.n_samples - 1):
+            with pytest.raises(IndexError):
+                reader.sample_at(i)
+        with pytest.raises(IndexError):
+            reader.read_inline_number(reader.ilines[0] - 1)
+
+
+def test_gen_trace_headers(zgy_sgy_file_pairs):
+    ZGY_FILE, SGY_FILE = zgy_sgy_file_pairs
+    reader = SeismicReader(ZGY_FILE)
+    with segyio.open(SGY_FILE) as sgyfile:
+        indices = np.arange(reader.tracecount)[::-1]
+        headers = reader.gen_trace_headers(indices)
+        assert headers.shape == (reader.tracecount, 240)
+        for row, trace_number in zip(headers, indices):
+            sgz_header = segyio.segy.Field(bytearray(row), kind='trace')
+            sgy_header = sgyfile.header[trace_number]
+            assert sgz_header[71] == -100
+            assert sgz_header[117] == int(reader.zinc * 1000)
+            for pos in [115, 181, 185, 189, 193]:
+                assert sgz_header[pos] == sgy_header[pos]
+    with pytest.raises(IndexError):
+        reader.gen_trace_headers([0, reader.tracecount])
+
+    out = np.full((5, 240), 255, dtype=np.uint8)
+    assert reader.gen_trace_headers(range(5), out=out) is out
+    assert np.array_equal(out, headers[::-1][:5])
+    with pytest.raises(ValueError):
+        reader.gen_trace_headers(range(4), out=out)
+
+
+def test_gen_trace_headers_matches_scalar(zgy_sgy_file_pairs):
+    ZGY_FILE, _ = zgy_sgy_file_pairs
+    with SeismicReader(ZGY_FILE) as reader:
+        headers = reader.gen_trace_headers(range(reader.tracecount))
+        for index, row in enumerate(headers):
+            assert bytes(row) == bytes(reader.gen_trace_header(index).buf)
+            assert bytes(row) == reader.gen_trace_header_bytes(index)
+
+
+def test_read_slices_without_copy(zgy_sgy_file_pairs):
+    ZGY_FILE, _ = zgy_sgy_file_pairs
+    with SeismicReader(ZGY_FILE) as reader:
+        for read in (reader.read_inline, reader.read_crossline, reader.read_zslice):
+            view = read(2, copy=False)
+            assert np.array_equal(view, read(2))
+            assert not view.flags.writeable
+            assert read(2).flags.writeable
+
+
+def test_read_traces(zgy_sgy_file_pairs):
+    ZGY_FILE, SGY_FILE = zgy_sgy_file_pairs
+    reader = SeismicReader(ZGY_FILE)
+    indices = np.random.default_rng(0).permutation(reader.tracecount)[:15]
+    traces = reader.read_traces(indices)
+    with segyio.open(SGY_FILE) as sgyfile:
+        for trace_zgy, trace_number in zip(traces, indices):
+            assert np.allclose(trace_zgy, sgyfile.trace[trace_number], rtol=1e-5)
+    assert reader.read_traces([]).shape == (0, reader.n_samples)
+    with pytest.raises(IndexError):
+        reader.read_traces([reader.tracecount])
+
+
+def test_gen_cdp_xy_bulk(zgy_sgy_file_pairs):
+    ZGY_FILE, _ = zgy_sgy_file_pairs
+    with SeismicReader(ZGY_FILE) as reader:
+        il_coord, xl_coord = np.indices((reader.n_ilines, reader.n_xlines))
+        cdp_xy = reader.gen_cdp_xy_bulk(il_coord, xl_coord)
+        assert cdp_xy.shape == (reader.n_ilines, reader.n_xlines, 2)
+        assert np.allclose(cdp_xy[..., 0], reader.gen_cdp_x(il_coord, xl_coord))
+        assert np.allclose(cdp_xy[..., 1], reader.gen_cdp_y(il_coord, xl_coord))
+        assert np.allclose(cdp_xy[-1, -1], reader.corners[3])
+
+
+def write_prefetch_file(path):
+    data = np.random.default_rng(0).random((200, 3, 70), dtype=np.float32)
+    with SeismicWriter(path, data.shape, 0.0, 4.0, (1, 1), (1, 1)) as writer:
+        writer.write_volume(data)
+    return str(path), data
+
+
+def test_chunk_prefetch_sequential_reads(temp_dir):
+    filename, data = write_prefetch_file(temp_dir/"prefetch.zgy")
+
+    with SeismicReader(filename) as reader:
+        for il in range(reader.n_ilines):
+            assert np.array_equal(reader.read_inline(il), data[il])
+        for z in range(reader.n_samples):
+            assert np.array_equal(reader.read_zslice(z), data[:, :, z])
+    assert reader._prefetch_pool is None
+    assert not reader._prefetched
+
+    zgyfile = pyzgy.open(filename)
+    for il in zgyfile.ilines[:130]:
+        zgyfile.iline[il]
+    zgyfile.close()
+    assert zgyfile.iline._prefetch_pool is None
+    assert not zgyfile.iline._prefetched
+    assert zgyfile.iline._chunk_cache["il"] == (None, None)
+
+
+def test_chunk_prefetch_loads_in_background(temp_dir):
+    filename, data = write_prefetch_file(temp_dir/"prefetch_background.zgy")
+
+    with SeismicReader(filename) as reader:
+        if not reader.filehandle._fd.threadsafe:
+            pytest.skip("file backend does not allow concurrent reads")
+        calls = []
+        load_inline_chunk = reader._chunk_loaders["il"]
+        def record(base):
+            calls.append((base, threading.current_thread() is threading.main_thread()))
+            return load_inline_chunk(base)
+        reader._chunk_loaders["il"] = record
+
+        assert np.array_equal(reader.read_inline(0), data[0])
+        assert "il" not in reader._prefetched
+        assert np.array_equal(reader.read_inline(64), data[64])
+        assert reader._prefetched["il"][0] == 128
+        for il in range(65, reader.n_ilines):
+            assert np.array_equal(reader.read_inline(il), data[il])
+        # 128 and 192 were decompressed in the background, not by the reading thread
+        assert calls == [(0, True), (64, True), (128, False), (192, False)]
+
+        assert np.array_equal(reader.read_zslice(3), data[:, :, 3])
+        assert "z" not in reader._prefetched
+
+
+def test_chunk_prefetch_needs_threadsafe_backend(temp_dir, monkeypatch):
+    filename, data = write_prefetch_file(temp_dir/"prefetch_serial.zgy")
+
+    with SeismicReader(filename) as reader:
+        monkeypatch.setattr(type(reader.filehandle._fd), "threadsafe", property(lambda self: False))
+        for il in range(reader.n_ilines):
+            assert np.array_equal(reader.read_inline(il), data[il])
+        assert not reader._prefetched
+        assert reader._prefetch_pool is None
+
+
+def test_chunk_prefetch_opt_out(temp_dir):
+    filename, data = write_prefetch_file(temp_dir/"prefetch_off.zgy")
+
+    with SeismicReader(filename, prefetch=False) as reader:
+        for il in range(reader.n_ilines):
+            assert np.array_equal(reader.read_inline(il), data[il])
+        assert not reader._prefetched
+        assert reader._prefetch_pool is None
+
+    with pyzgy.open(filename, prefetch=False) as zgyfile:
+        for il in zgyfile.ilines:
+            assert np.array_equal(zgyfile.iline[il], data[il - 1])
+        assert zgyfile.iline._prefetch_pool is None
+
+
+# openzgy only reports world corners for a degenerate survey when it has a single inline
+@pytest.mark.parametrize("shape", [(1, 4, 10), (1, 1, 10)])
+def test_trace_headers_single_line(shape, temp_dir):
+    data = np.ones(shape, dtype=np.float32)
+    filename = temp_dir/"single_line_{}x{}.zgy".format(*shape[:2])
+    with SeismicWriter(filename, shape, 0.0, 4.0, (1, 1), (1, 1), corners=((10, 20), (110, 20), (10, 120), (110, 120))) as writer:
+        writer.write_volume(data)
+
+    with SeismicReader(str(filename)) as reader:
+        headers = reader.gen_trace_headers(range(reader.tracecount))
+        for index, row in enumerate(headers):
+            header = reader.gen_trace_header(index)
+            assert bytes(row) == bytes(header.buf)
+            assert header[181] == 1000 + (header[193] - 1) * int(round(100 * reader.easting_inc_xl))
+        assert reader.easting_inc_il == reader.northing_inc_il == 0.0
+        assert np.isfinite(reader.gen_cdp_xy_bulk(*np.indices(shape[:2]))).all()